@@ -1195,8 +1195,7 @@ except for when using the function decorator.
         total_visible_len = 0
         pos = 0
         for m in matches:
-            m_start = m.regs[0][0]
-            m_end = m.regs[0][1]
+            m_start, m_end = m.span()
             add_visible = s[pos:m_start]
             len_visible = m_start - pos
             overflow = (len_visible + total_visible_len) - maxlength
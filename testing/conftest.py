@@ -180,7 +180,7 @@ def patched_completions(monkeypatch):
             val = _pdb.complete(text, len(comps))
             if val is None:
                 break
-            comps += [val]
+            comps.append(val)
         return comps
 
     return inner
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 # noqa: B011
 import bdb
+import functools
 import inspect
 import io
 import os
@@ -23,7 +24,17 @@ from pygments import __version__ as pygments_version
 import pdbpp
 from pdbpp import DefaultConfig, Pdb, StringIO
 
-pygments_major, pygments_minor, _ = pygments_version.split(".")
+PYGMENTS_VERSION = tuple(int(x) for x in pygments_version.split(".")[:2])
+# Since 2.19 pygments also highlights the whitespace after keywords.
+PYGMENTS_WS = "^[[38;5;250m ^[[39m" if PYGMENTS_VERSION >= (2, 19) else " "
+
+IS_PY312 = sys.version_info >= (3, 12)
+IS_PY313 = sys.version_info >= (3, 13)
+# https://github.com/python/cpython/issues/90095
+PDBRC_READ_FIXED = (
+    (sys.version_info >= (3, 11, 9) and sys.version_info <= (3, 12, 1))
+    or sys.version_info >= (3, 12, 2)
+) and sys.platform != "darwin"
 
 
 # Windows support
@@ -37,25 +48,23 @@ pygments_major, pygments_minor, _ = pygments_version.split(".")
 # tools return the `normcase` version (eg: all lowercase), so we adjust the
 # canonical filename accordingly.
 RE_THIS_FILE = re.escape(__file__)
-THIS_FILE_CANONICAL = __file__
-if sys.platform == "win32":
-    THIS_FILE_CANONICAL = __file__.lower()
+THIS_FILE_CANONICAL = os.path.normcase(__file__)
 RE_THIS_FILE_CANONICAL = re.escape(THIS_FILE_CANONICAL)
 RE_THIS_FILE_CANONICAL_QUOTED = re.escape(quote(THIS_FILE_CANONICAL))
 RE_THIS_FILE_QUOTED = re.escape(quote(__file__))
 
 
-class FakeStdin:
+class FakeStdin(io.StringIO):
+    """Feeds the given lines, echoing them to stdout when read."""
+
     def __init__(self, lines):
-        self.lines = iter(lines)
+        super().__init__("".join(f"{line}\n" for line in lines))
 
-    def readline(self):
-        try:
-            line = next(self.lines) + "\n"
+    def readline(self, *args):
+        line = super().readline(*args)
+        if line:
             sys.stdout.write(line)
-            return line
-        except StopIteration:
-            return ""
+        return line
 
 
 class ConfigTest(DefaultConfig):
@@ -115,6 +124,11 @@ class PdbTest(pdbpp.Pdb):
         return self.default(arg)
 
 
+class PdbWithMockedInspect(PdbTest):
+    def do_inspect(self, arg):
+        print(f"mocked_inspect: {arg}")
+
+
 def set_trace_via_module(frame=None, cleanup=True, Pdb=PdbTest, **kwds):
     """set_trace helper that goes through pdb.set_trace.
 
@@ -151,6 +165,9 @@ def xpm():
     pdbpp.xpm(PdbTest)
 
 
+trans_esc_table = str.maketrans({chr(27): "^["})
+
+
 def runpdb(
     func: Callable,
     input: list[str],
@@ -162,23 +179,21 @@ def runpdb(
     # Use __dict__ to avoid class descriptor (staticmethod).
     old_get_terminal_size = pdbpp.Pdb.__dict__["get_terminal_size"]
 
-    class MyBytesIO(BytesIO):
+    class MyStringIO(StringIO):
         """write accepts unicode or bytes"""
 
-        def __init__(self, encoding: str = "utf-8"):
-            self.encoding = encoding
+        encoding = "utf-8"
 
         def write(self, msg):
-            if isinstance(msg, str):
-                msg = msg.encode(self.encoding)
-            super().write(msg)
+            if isinstance(msg, bytes):
+                msg = msg.decode(self.encoding)
+            return super().write(msg)
 
         def get_unicode_value(self):
             return (
                 self.getvalue()
-                .decode(self.encoding)
                 .replace(pdbpp.CLEARSCREEN, "<CLEARSCREEN>\n")
-                .replace(chr(27), "^[")
+                .translate(trans_esc_table)
             )
 
     # Use a predictable terminal size.
@@ -187,8 +202,8 @@ def runpdb(
     pdbpp.Pdb.get_terminal_size = staticmethod(lambda: terminal_size)
     try:
         sys.stdin = FakeStdin(input)
-        sys.stdout = stdout = MyBytesIO()
-        sys.stderr = stderr = MyBytesIO()
+        sys.stdout = stdout = MyStringIO()
+        sys.stderr = stderr = MyStringIO()
         func()
     except InnerTestException:
         pass
@@ -204,30 +219,32 @@ def runpdb(
         sys.stderr = oldstderr
         pdbpp.Pdb.get_terminal_size = old_get_terminal_size
 
+    output = stdout.get_unicode_value()
     stderr = stderr.get_unicode_value()
     if stderr:
         # Make it available for pytests output capturing.
-        print(stdout.get_unicode_value())
+        print(output)
         raise AssertionError(f"Unexpected output on stderr: {stderr}")
 
-    return stdout.get_unicode_value().splitlines()
+    return output.splitlines()
+
+
+prompts = (
+    "# ",
+    "(#) ",
+    "((#)) ",
+    "(((#))) ",
+    "(Pdb) ",
+    "(Pdb++) ",
+    "(com++) ",
+    "... ",  # multiline prompt editing in 3.13
+)
+prompts_re = re.compile("|".join(map(re.escape, prompts)))
 
 
-def is_prompt(line: str) -> bool:
-    prompts = {
-        "# ",
-        "(#) ",
-        "((#)) ",
-        "(((#))) ",
-        "(Pdb) ",
-        "(Pdb++) ",
-        "(com++) ",
-        "... ",  # multiline prompt editing in 3.13
-    }
-    for prompt in prompts:
-        if line.startswith(prompt):
-            return len(prompt)
-    return False
+def is_prompt(line: str) -> int | bool:
+    m = prompts_re.match(line)
+    return m.end() if m else False
 
 
 def extract_commands(lines: list[str]) -> list[str]:
@@ -245,8 +262,8 @@ shortcuts = [
     ("(", "\\("),
     (")", "\\)"),
     ("^", "\\^"),
-    (r"\(Pdb++\) ", r"\(Pdb\+\+\) "),
-    (r"\(com++\) ", r"\(com\+\+\) "),
+    ("(Pdb++) ", r"\(Pdb\+\+\) "),
+    ("(com++) ", r"\(com\+\+\) "),
     ("<COLORCURLINE>", r"\^\[\[44m\^\[\[36;01;44m *[0-9]+\^\[\[00;44m"),
     ("<COLORNUM>", r"\^\[\[36;01m *[0-9]+\^\[\[00m"),
     ("<COLORFNAME>", r"\^\[\[33;01m"),
@@ -255,41 +272,52 @@ shortcuts = [
     ("<PYGMENTSRESET>", r"\^\[\[39[^m]*m"),
     ("NUM", " *[0-9]+"),
 ]
+shortcuts_dict = dict(shortcuts)
+# Longest keys first, so that e.g. "<COLORNUM>" wins over "NUM".
+shortcuts_re = re.compile(
+    "|".join(map(re.escape, sorted(shortcuts_dict, key=len, reverse=True)))
+)
+
+
+# Trailing "###" comments in expected output (not spanning lines).
+RE_COMMENT = re.compile(r"[^\S\n]+###.*")
 
 
 def cook_regexp(s):
-    for key, value in shortcuts:
-        s = s.replace(key, value)
-    return s
+    return shortcuts_re.sub(lambda m: shortcuts_dict[m.group()], s)
 
 
-def run_func(func, expected, terminal_size=None) -> tuple[list[str], list[str]]:
-    """Runs given function and returns its output along with expected patterns.
+@functools.cache
+def parse_expected(expected: str) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """Returns the cooked patterns and the commands for an expected block.
 
-    It does not make any assertions. To compare func's output with expected
-    lines, use `check` function.
+    This is cached, so that the (static) expected blocks of parametrized
+    tests get dedented and cooked only once.
     """
     # FIXME: I used textwrap.dedent everywwhere in tests.
     #       There's no fucking need to do that
-    expected = textwrap.dedent(expected).strip().splitlines()
     # Remove comments.
-    expected = [re.split(r"\s+###", line)[0] for line in expected]
-    commands = extract_commands(expected)
-    expected = map(cook_regexp, expected)
-
-    flattened = []
-    for line in expected:
-        if line == "":
-            flattened.append("")
-        else:
-            flattened.extend(line.splitlines())
-    expected = flattened
+    lines = RE_COMMENT.sub("", textwrap.dedent(expected).strip()).splitlines()
+    return tuple(map(cook_regexp, lines)), tuple(extract_commands(lines))
 
-    return expected, runpdb(func, commands, terminal_size)
+
+def run_func(func, expected, terminal_size=None) -> tuple[list[str], list[str]]:
+    """Runs given function and returns its output along with expected patterns.
+
+    It does not make any assertions. To compare func's output with expected
+    lines, use `check` function.
+    """
+    expected, commands = parse_expected(expected)
+    return list(expected), runpdb(func, commands, terminal_size)
 
 
 def count_frames():
-    return len(traceback.extract_stack())
+    f = sys._getframe()
+    n = 0
+    while f is not None:
+        n += 1
+        f = f.f_back
+    return n
 
 
 class InnerTestException(Exception):
@@ -298,6 +326,13 @@ class InnerTestException(Exception):
     pass
 
 
+@functools.cache
+def compile_pattern(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern)
+
+
+RE_TRAILING_WHITESPACE = re.compile(r"\s+$")
+
 trans_trn_dict = {"\n": r"\n", "\r": r"\r", "\t": r"\t"}
 trans_trn_table = str.maketrans(trans_trn_dict)
 
@@ -306,6 +341,27 @@ def trans_trn(string):
     return string.translate(trans_trn_table)
 
 
+@functools.cache
+def py313_preamble(set_trace_args: str = "", funcname: str = "fn") -> str:
+    """The extra "next" step needed after set_trace() on 3.13+ ("" before)."""
+    if not IS_PY313:
+        return ""
+    return textwrap.dedent(
+        f"""
+        [NUM] > .*{funcname}()
+        -> set_trace({set_trace_args})
+           5 frames hidden .*
+        # n
+        """.rstrip(),
+    )
+
+
+@functools.cache
+def add_313_preamble(expected: str, set_trace_args: str = "") -> str:
+    """Prepends the extra "next" step needed with set_trace() on 3.13+."""
+    return py313_preamble(set_trace_args) + textwrap.dedent(expected)
+
+
 def check(
     func,
     expected,
@@ -316,33 +372,19 @@ def check(
     if set_trace_args and not add_313_fix:
         raise ValueError("cannot use set_trace_args without add_313_fix")
 
-    if add_313_fix and sys.version_info >= (3, 13):
-        expected = textwrap.dedent(
-            f"""
-            [NUM] > .*fn()
-            -> set_trace({set_trace_args or ""})
-               5 frames hidden .*
-            # n
-            """.rstrip(),
-        ) + textwrap.dedent(expected)
+    if add_313_fix and IS_PY313:
+        expected = add_313_preamble(expected, set_trace_args or "")
 
     expected, lines = run_func(func, expected, terminal_size)
-    maxlen = max(map(len, expected)) if expected else 0
+    rows = []
     all_ok = True
-    print()
-    print(
-        pdbpp.Color.set(pdbpp.Color.darkgreen, "Expected".ljust(maxlen + 1)),
-        "| ",
-        pdbpp.Color.set(pdbpp.Color.yellow, "Actual"),
-    )
-    print("=" * (2 * maxlen + 3))
     for pattern, string in zip_longest(expected, lines):
         if pattern is not None and string is not None:
-            if is_prompt(pattern) and is_prompt(string):
+            if prompts_re.match(pattern) and prompts_re.match(string):
                 ok = True
             else:
                 try:
-                    ok = re.match(pattern, string)
+                    ok = compile_pattern(pattern).match(string)
                 except re.error as exc:
                     raise ValueError(f"re.match failed for {pattern!r}: {exc!r}")  # noqa: B904
         else:
@@ -351,19 +393,34 @@ def check(
                 pattern = "<None>"
             if string is None:
                 string = "<None>"
+        if not ok:
+            all_ok = False
+        rows.append((pattern, string, ok))
+    if all_ok:
+        return
+
+    # Print the diff (only on failure, for pytest's output capturing).
+    width = (max(map(len, expected)) if expected else 0) + 1
+    print()
+    print(
+        pdbpp.Color.set(pdbpp.Color.darkgreen, "Expected".ljust(width)),
+        "| ",
+        pdbpp.Color.set(pdbpp.Color.yellow, "Actual"),
+    )
+    print("=" * (2 * width + 1))
+    for pattern, string, ok in rows:
         # Use "$" to mark end of line with trailing space
-        if re.search(r"\s+$", string):
+        if RE_TRAILING_WHITESPACE.search(string):
             string += "$"
-        if re.search(r"\s+$", pattern):
+        if RE_TRAILING_WHITESPACE.search(pattern):
             pattern += "$"
         pattern = trans_trn(pattern)
         string = trans_trn(string)
-        print(pattern.ljust(maxlen + 1), "| ", string, end="")
+        print(f"{pattern:<{width}} |  {string}", end="")
         if ok:
             print()
         else:
             print(pdbpp.Color.set(pdbpp.Color.red, "    <<<<<"))
-            all_ok = False
     assert all_ok
 
 
@@ -523,7 +580,7 @@ def test_set_trace_remembers_previous_state():
         a = 4
         return a
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
             [NUM] > .*fn()
             -> set_trace(.*)
@@ -574,7 +631,7 @@ def test_set_trace_remembers_previous_state_via_module():
         a = 4
         return a
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
 
         def get_trace_lines_str(cleanup=True) -> str:
             """helper to avoid repeating set_trace() lines"""
@@ -680,7 +737,7 @@ def test_forget_with_new_pdb():
         new_pdb = NewPdb()
         new_pdb.set_trace()
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
             [NUM] > .*fn()
             -> set_trace()
@@ -749,7 +806,7 @@ def test_global_pdb_with_classmethod():
         new_pdb = NewPdb()
         new_pdb.set_trace()
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
         [NUM] > .*fn()
         -> set_trace()
@@ -815,7 +872,7 @@ def test_global_pdb_via_new_class_in_init_method():
         third = pdbpp.local.GLOBAL_PDB
         assert third == second
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent("""
             [NUM] > .*fn()
             -> set_trace()
@@ -895,7 +952,7 @@ def test_global_pdb_via_existing_class_in_init_method():
         third = pdbpp.local.GLOBAL_PDB
         assert third == second
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent("""
             [NUM] > .*fn()
             -> set_trace()
@@ -966,7 +1023,7 @@ def test_global_pdb_can_be_skipped():
         set_trace(cleanup=False)
         assert pdbpp.local.GLOBAL_PDB is not new_pdb
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent("""
             [NUM] > .*fn()
             -> set_trace()
@@ -1072,7 +1129,7 @@ def test_global_pdb_can_be_skipped_but_set():
         set_trace(cleanup=False)
         assert pdbpp.local.GLOBAL_PDB is new_pdb
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
         [NUM] > .*fn()
         -> set_trace()
@@ -1239,6 +1296,7 @@ def test_single_question_mark():
         c = 3
         return a + b + c
 
+    lineno = fn.__code__.co_firstlineno
     expected = textwrap.dedent(rf"""
         [NUM] > .*fn()
         -> a = 1
@@ -1248,13 +1306,13 @@ def test_single_question_mark():
         # f2?
         .*Type:.*function
         .*String Form:.*<function .*f2 at .*>
-        ^[[31;01mFile:^[[00m           {RE_THIS_FILE_CANONICAL}:{fn.__code__.co_firstlineno + 4}
+        ^[[31;01mFile:^[[00m           {RE_THIS_FILE_CANONICAL}:{lineno + 4}
         .*Definition:.*f2(x, y)
         .*Docstring:.*Return product of x and y
         # nodoc?
         .*Type:.*function
         .*String Form:.*<function .*nodoc at .*>
-        ^[[31;01mFile:^[[00m           {RE_THIS_FILE_CANONICAL}:{fn.__code__.co_firstlineno + 1}
+        ^[[31;01mFile:^[[00m           {RE_THIS_FILE_CANONICAL}:{lineno + 1}
         ^[[31;01mDefinition:^[[00m     nodoc()
         # doesnotexist?
         \*\*\* NameError.*
@@ -1398,11 +1456,7 @@ def test_single_question_mark_with_existing_command(monkeypatch):
         \*\*\* Invalid argument: ?
           Usage: a(rgs)
         """.rstrip()
-            if sys.version_info
-            >= (
-                3,
-                13,
-            )  # in 3.13, calling a(rgs) with arguments returns an error. See https://github.com/python/cpython/issues/103464
+            if IS_PY313  # in 3.13, calling a(rgs) with arguments returns an error. See https://github.com/python/cpython/issues/103464
             else ""
         )
         + """
@@ -1418,20 +1472,9 @@ def test_single_question_mark_with_existing_command(monkeypatch):
         """
     )
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-            [NUM] > .*fn()
-            -> set_trace()
-               5 frames hidden .*
-            # n
-            """.rstrip()
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
-    if sys.version_info >= (3, 12):
+    if IS_PY312:
         expected = expected.replace(".*Print the argument", "\n.*Print the argument")
 
     expected += "# c"
@@ -1462,18 +1505,7 @@ def test_up_local_vars():
 """
     )
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-        [NUM] > .*nested()
-        -> set_trace()
-           5 frames hidden .*
-        # n
-        """.rstrip()
-            )
-            + expected
-        )
+    expected = py313_preamble(funcname="nested") + expected
     check(fn, expected)
 
 
@@ -1502,41 +1534,25 @@ def test_frame():
         [ 0] > .*()
         -> .*
         # f -1
-        [{len(traceback.extract_stack())}] > .*c()
+        [{count_frames() - 1}] > .*c()
         -> return
         # c
     """)
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*c()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble(funcname="c") + expected
 
     check(a, expected)
 
 
-def test_fstrings(monkeypatch):
-    def mocked_inspect(self, arg):
-        print(f"mocked_inspect: {arg}")
-
-    monkeypatch.setattr(PdbTest, "do_inspect", mocked_inspect)
-
+def test_fstrings():
     def f():
-        set_trace()
+        set_trace(Pdb=PdbWithMockedInspect)
 
     expected = textwrap.dedent(
         """
         --Return--
         [NUM] > .*
-        -> set_trace()
+        -> set_trace(Pdb=PdbWithMockedInspect)
            5 frames hidden .*
         # f"fstring"
         'fstring'
@@ -1545,36 +1561,20 @@ def test_fstrings(monkeypatch):
         # c
     """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*f()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Pdb=PdbWithMockedInspect", funcname="f") + expected
 
     check(f, expected)
 
 
-def test_prefixed_strings(monkeypatch):
-    def mocked_inspect(self, arg):
-        print(f"mocked_inspect: {arg}")
-
-    monkeypatch.setattr(PdbTest, "do_inspect", mocked_inspect)
-
+def test_prefixed_strings():
     def f():
-        set_trace()
+        set_trace(Pdb=PdbWithMockedInspect)
 
     expected = textwrap.dedent(
         """
         --Return--
         [NUM] > .*
-        -> set_trace()
+        -> set_trace(Pdb=PdbWithMockedInspect)
            5 frames hidden .*
         # b"string"
         {bytestring!r}
@@ -1591,18 +1591,7 @@ def test_prefixed_strings(monkeypatch):
         # c
     """.format(bytestring=b"string", unicodestring="string"),
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*f()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Pdb=PdbWithMockedInspect", funcname="f") + expected
 
     check(f, expected)
 
@@ -1632,18 +1621,7 @@ def test_up_down_arg():
         # c
     """
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*c()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble(funcname="c") + expected
 
     check(a, expected)
 
@@ -1675,18 +1653,7 @@ def test_up_down_sticky():
         # c
     """
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*b()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble(funcname="b") + expected
 
     check(a, expected)
 
@@ -1711,23 +1678,12 @@ def test_top_bottom():
         [ 0] > .*()
         -> .*
         # bottom
-        [{len(traceback.extract_stack())}] > .*c()
+        [{count_frames() - 1}] > .*c()
         -> return
         # c
     """
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*c()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble(funcname="c") + expected
 
     check(a, expected)
 
@@ -1837,18 +1793,7 @@ def test_parseline():
         # !!c
     """
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(fn, expected)
 
@@ -1871,7 +1816,7 @@ def test_parseline_with_rc_commands(tmpdir):
             alias = "trigger"  # noqa: F841
             set_trace(readrc=True)
 
-        if sys.version_info >= (3, 13):
+        if IS_PY313:
             expected = textwrap.dedent(
                 """
                 [NUM] .*fn()
@@ -1881,19 +1826,13 @@ def test_parseline_with_rc_commands(tmpdir):
                 """.rstrip()
             )
         else:
-            pdbrc_read_fixed = (
-                # https://github.com/python/cpython/issues/90095
-                (sys.version_info >= (3, 11, 9) and sys.version_info <= (3, 12, 1))
-                or sys.version_info >= (3, 12, 2)
-            ) and sys.platform != "darwin"
-
             # fmt: off
             expected = ("""
                 --Return--""" + ("""
-                'readrc'""" if not pdbrc_read_fixed else "") + """
+                'readrc'""" if not PDBRC_READ_FIXED else "") + """
                 [NUM] > .*fn()->None
                 -> set_trace(readrc=True)
-                   5 frames hidden .*""" + ("" if not pdbrc_read_fixed else """
+                   5 frames hidden .*""" + ("" if not PDBRC_READ_FIXED else """
                 'readrc'""")
             )
             # fmt: on
@@ -1933,12 +1872,12 @@ def test_parseline_with_existing_command():
         # print(pdbpp.local.GLOBAL_PDB.parseline("a = "))
         (None, None, 'a = ')
         # print(pdbpp.local.GLOBAL_PDB.parseline("list()"))""" + ( """
-        ('list()', '', 'list()')""" if sys.version_info >= (3, 13) else """
+        ('list()', '', 'list()')""" if IS_PY313 else """
         (None, None, 'list()
         """).rstrip() + """
         # print(pdbpp.local.GLOBAL_PDB.parseline("next(my_iter)"))""" + ("""
         ('next(my_iter)', '', 'next(my_iter)')
-        """ if sys.version_info >= (3, 13) else """
+        """ if IS_PY313 else """
         (None, None, 'next(my_iter)')
         """).rstrip() + """
         # c
@@ -1968,7 +1907,7 @@ def test_parseline_remembers_smart_command_escape():
         n = 44
         return n
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
             [NUM] > .*fn()
             -> set_trace()
@@ -2030,18 +1969,7 @@ def test_args_name():
         # c
         """,
     )
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(fn, expected)
 
@@ -2054,11 +1982,9 @@ def lineno():
     return frame.f_back.f_lineno
 
 
-def test_help():
-    instance = PdbTest()
-    instance.stdout = StringIO()
-
-    help_params = [
+@pytest.mark.parametrize(
+    "command,expected_regex",
+    [
         ("", r"Documented commands \(type help <topic>\):"),
         ("EOF", "Handles the receipt of EOF as a command."),
         ("a", "Print the argument"),
@@ -2128,24 +2054,17 @@ def test_help():
         ("source", r"\*\*\* No help"),
         ("unknown_command", r"\*\*\* No help"),
         ("help", "print the list of available commands."),
-    ]
+    ],
+)
+def test_help(command, expected_regex, capsys):
+    instance = PdbTest()
+    instance.stdout = StringIO()
 
-    # Redirect sys.stdout because Python 2 pdb.py has `print >>self.stdout` for
-    # some functions and plain ol' `print` for others.
-    oldstdout = sys.stdout
-    sys.stdout = instance.stdout
-    errors = []
-    try:
-        for command, expected_regex in help_params:
-            instance.do_help(command)
-            output = instance.stdout.getvalue()
-            if not re.search(expected_regex, output):
-                errors.append(command)
-    finally:
-        sys.stdout = oldstdout
+    instance.do_help(command)
 
-    if errors:
-        pytest.fail("unexpected help for: {}".format(", ".join(errors)))
+    # Some help paths print to sys.stdout instead of self.stdout.
+    output = instance.stdout.getvalue() + capsys.readouterr().out
+    assert re.search(expected_regex, output), f"unexpected help for {command!r}"
 
 
 def test_shortlist():
@@ -2168,18 +2087,7 @@ def test_shortlist():
         """,
     )
 
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigTest)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigTest") + expected
 
     check(
         fn,
@@ -2187,65 +2095,38 @@ def test_shortlist():
     )
 
 
-def test_shortlist_with_pygments_and_EOF():
-    def fn():
-        a = 1
-        set_trace(Config=ConfigWithPygments)
-        return a
-
-    expected = textwrap.dedent(f"""
-        [NUM] > .*fn()
-        -> ^[[38;5;28;01mreturn^[[39;00m a
-           5 frames hidden .*
-        # l {100000}, 3
-        [EOF]
-        # c
-        """)
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygments)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
-
-    check(
-        fn,
-        expected,
-    )
-
-
-def test_shortlist_with_highlight_and_EOF():
+@pytest.mark.parametrize(
+    "config,set_trace_args,return_line",
+    [
+        pytest.param(
+            ConfigWithPygments,
+            "Config^[[38;5;241m=^[[39mconfig",
+            "^[[38;5;28;01mreturn^[[39;00m a",
+            id="pygments",
+        ),
+        pytest.param(
+            ConfigWithHighlight,
+            "Config=config",
+            "return a",
+            id="highlight",
+        ),
+    ],
+)
+def test_shortlist_with_EOF(config, set_trace_args, return_line):
     def fn():
         a = 1
-        set_trace(Config=ConfigWithHighlight)
+        set_trace(Config=config)
         return a
 
     expected = textwrap.dedent(f"""
         [NUM] > .*fn()
-        -> return a
+        -> {return_line}
            5 frames hidden .*
-        # l {100000}, 3
+        # l 100000, 3
         [EOF]
         # c
         """)
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigWithHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble(set_trace_args) + expected
 
     check(
         fn,
@@ -2276,12 +2157,7 @@ def test_shortlist_with_pygments(config, monkeypatch):
 
     monkeypatch.setattr(pdbpp.Pdb, "_get_source_highlight_function", check_calls)
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mfn^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mfn^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mfn^[[39m():"
 
     expected = textwrap.dedent(f"""
         [NUM] > .*fn()
@@ -2297,7 +2173,7 @@ def test_shortlist_with_pygments(config, monkeypatch):
         # c
     """)
     expected_n_calls = 3
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 """
@@ -2351,18 +2227,7 @@ def test_shortlist_with_partial_code():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygments)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygments") + expected
     check(
         fn,
         expected,
@@ -2377,12 +2242,7 @@ def test_truncated_source_with_pygments():
 
         return a
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mfn^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mfn^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mfn^[[39m():"
 
     expected = textwrap.dedent(f"""
             [NUM] > .*fn()
@@ -2407,18 +2267,7 @@ def test_truncated_source_with_pygments():
             # c
             """)  # noqa: UP032
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygments)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygments") + expected
     check(
         fn,
         expected,
@@ -2433,12 +2282,7 @@ def test_truncated_source_with_pygments_and_highlight():
 
         return a
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mfn^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mfn^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mfn^[[39m():"
 
     expected = textwrap.dedent(
         f"""
@@ -2464,18 +2308,10 @@ def test_truncated_source_with_pygments_and_highlight():
         # c
         """,  # noqa: UP032
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = (
+        py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight")
+        + expected
+    )
     check(
         fn,
         expected,
@@ -2504,18 +2340,7 @@ def test_shortlist_with_highlight():
         """,
     )
 
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigWithHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigWithHighlight") + expected
 
     check(
         fn,
@@ -2551,18 +2376,7 @@ def test_shortlist_without_arg():
         # c
         """,
     )
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigTest)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigTest") + expected
 
     check(
         fn,
@@ -2591,18 +2405,7 @@ def test_shortlist_heuristic():
         # c
         """,
     )
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigTest)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigTest") + expected
 
     check(
         fn,
@@ -2618,17 +2421,18 @@ def test_shortlist_with_second_set_trace_resets_lineno():
         set_trace()
         f1()
 
+    lineno = fn.__code__.co_firstlineno
     expected = textwrap.dedent(
         rf"""
         [NUM] > .*fn()
         -> f1()
            5 frames hidden .*
-        # l {fn.__code__.co_firstlineno}, 2
+        # l {lineno}, 2
         NUM \t    def fn():
         NUM \t        def f1():
         NUM \t            set_trace(cleanup=False)
         # import pdb; pdbpp.local.GLOBAL_PDB.lineno
-        {fn.__code__.co_firstlineno + 2}
+        {lineno + 2}
         # c
         """.rstrip()
     ) + textwrap.dedent(
@@ -2639,7 +2443,7 @@ def test_shortlist_with_second_set_trace_resets_lineno():
         # import pdb; pdbpp.local.GLOBAL_PDB.lineno
         # c
         """
-        if sys.version_info >= (3, 13)
+        if IS_PY313
         else """
         --Return--
         [NUM] > .*f1()->None
@@ -2650,18 +2454,7 @@ def test_shortlist_with_second_set_trace_resets_lineno():
         """
     )
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(
         fn,
@@ -2688,18 +2481,7 @@ def test_longlist():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(
         fn,
@@ -2745,18 +2527,7 @@ def test_longlist_displays_whole_function():
 
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(
         fn,
@@ -2785,7 +2556,7 @@ class TestListWithChangedSource:
 
             def after_settrace():
                 import linecache
-                linecache.checkcache()
+                linecache.checkcache(__file__)
 
             def fn():
                 set_trace()
@@ -2812,7 +2583,7 @@ class TestListWithChangedSource:
        5 frames hidden (try 'help hidden_frames')
     (Pdb++) l
     NUM  \t    import linecache$
-    NUM  \t    linecache.checkcache()$
+    NUM  \t    linecache.checkcache(__file__)$
     NUM  \t$
     NUM  \tdef fn():
     NUM  \t    set_trace()
@@ -2891,18 +2662,7 @@ def test_longlist_with_highlight():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigWithHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigWithHighlight") + expected
 
     check(
         fn,
@@ -2940,18 +2700,7 @@ def test_display():
            5 frames hidden .*
         # c
         """)
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip()
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(fn, expected)
 
@@ -2975,18 +2724,7 @@ def test_display_undefined():
                 # c
                 """)
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip()
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(fn, expected)
 
@@ -3040,7 +2778,7 @@ def test_sticky_resets_cls():
         set_trace(cleanup=False)
         return a
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         marker_313 = "->"
         marker_pre_313 = "  "
     else:
@@ -3084,7 +2822,7 @@ def test_sticky_resets_cls():
         """
         # c
         """
-        if sys.version_info >= (3, 13)
+        if IS_PY313
         else r"""
         \ return 1
         # c
@@ -3103,7 +2841,7 @@ def test_sticky_with_same_frame():
         for cleanup in (True, False):
             inner(cleanup)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         marker_313 = "->"
         marker_pre_313 = "  "
     else:
@@ -3144,7 +2882,7 @@ def test_sticky_with_same_frame():
         # c
         False
         """.lstrip()
-        if sys.version_info >= (3, 13)
+        if IS_PY313
         else """
         False
         [NUM] > .*inner()->None, 5 frames hidden
@@ -3156,15 +2894,9 @@ def test_sticky_with_same_frame():
         """.lstrip()
     )
 
-    if sys.version_info >= (3, 13):
-        expected = textwrap.dedent(
-            """
-            [NUM] > .*inner()
-            -> set_trace(cleanup=cleanup)
-               5 frames hidden .*
-            # n
-            """.rstrip(),
-        ) + textwrap.dedent(expected)
+    expected = py313_preamble("cleanup=cleanup", funcname="inner") + textwrap.dedent(
+        expected
+    )
 
     check(fn, expected)
 
@@ -3177,7 +2909,7 @@ def test_sticky_range():
         c = 3  # noqa: F841
         return a
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     start = lineno + 1
     end = lineno + 3
 
@@ -3208,7 +2940,7 @@ def test_sticky_by_default():
         c = 3  # noqa: F841
         return a
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         marker_313 = "->"
         marker_pre_313 = "  "
     else:
@@ -3247,14 +2979,9 @@ def test_sticky_by_default_with_use_pygments_auto():
         a = 1
         return a
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mfn^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mfn^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mfn^[[39m():"
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             f"""
             [NUM] > .*fn().*
@@ -3356,15 +3083,7 @@ def test_sticky_dunder_exception_with_highlight():
         <COLORLNUM>InnerTestException: <COLORRESET>
         # c
     """)
-    if sys.version_info >= (3, 13):
-        expected = textwrap.dedent(
-            """
-            [NUM] > .*fn()
-            -> set_trace(Config=ConfigWithHighlight)
-               5 frames hidden .*
-            # n
-            """.rstrip(),
-        ) + textwrap.dedent(expected)
+    expected = py313_preamble("Config=ConfigWithHighlight") + textwrap.dedent(expected)
 
     check(fn, expected)
 
@@ -3544,7 +3263,7 @@ def test_sticky_dunder_return_with_highlight():
         returns()
 
     to_run = "# s\n# sticky\n# r\n# retval\n# c"
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         to_run = f"# n\n{to_run}"
 
     expected, lines = run_func(fn, to_run)
@@ -3585,7 +3304,7 @@ def test_sticky_cutoff_with_tail():
         1
         """)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), .* frames hidden
@@ -3632,7 +3351,7 @@ def test_sticky_cutoff_with_head():
         # c
         1
         """)
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), 5 frames hidden
@@ -3681,7 +3400,7 @@ def test_sticky_cutoff_with_head_and_tail():
         1
         """)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), 5 frames hidden
@@ -3752,7 +3471,7 @@ def test_sticky_cutoff_with_long_head_and_tail():
         # c
         1
         """)
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), 5 frames hidden
@@ -3808,7 +3527,7 @@ def test_sticky_cutoff_with_decorator():
         1
         """)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), 5 frames hidden
@@ -3865,7 +3584,7 @@ def test_sticky_cutoff_with_many_decorators():
         # c
         1
         """)
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent("""
             [NUM] > .*(NUM)fn(), 5 frames hidden
@@ -3906,34 +3625,23 @@ def test_sticky_cutoff_with_decorator_colored():
         print(1)
         return
 
-    expected = (
-        textwrap.dedent(
-            """
-            [NUM] > .*fn(), 5 frames hidden
-            <COLORNUM>         ^[[38;5;129m@deco^[[39m
-            <COLORNUM>         ^[[38;5;129m@deco^[[39m
-            ...
-            """.rstrip()
-        )
-        + textwrap.dedent(
-            """
-            <COLORCURLINE>  ->         set_trace.*
-            <COLORNUM>             ^[[38;.*mprint.*
-            """
-            if sys.version_info >= (3, 13)
-            else """
-            <COLORNUM>             set_trace.*
-            <COLORCURLINE>  ->         ^[[38;.*mprint.*
-            """
-        ).rstrip()
-        + textwrap.dedent(
-            """
-            <COLORNUM>             ^[[38;5;28;01mreturn^[[39;00m
-            # c
-            1
-            """,
-        )
-    )
+    if IS_PY313:
+        set_trace_line = "<COLORCURLINE>  ->         set_trace.*"
+        print_line = "<COLORNUM>             ^[[38;.*mprint.*"
+    else:
+        set_trace_line = "<COLORNUM>             set_trace.*"
+        print_line = "<COLORCURLINE>  ->         ^[[38;.*mprint.*"
+    expected = f"""
+        [NUM] > .*fn(), 5 frames hidden
+        <COLORNUM>         ^[[38;5;129m@deco^[[39m
+        <COLORNUM>         ^[[38;5;129m@deco^[[39m
+        ...
+        {set_trace_line}
+        {print_line}
+        <COLORNUM>             ^[[38;5;28;01mreturn^[[39;00m
+        # c
+        1
+        """
 
     check(
         fn,
@@ -3970,7 +3678,7 @@ def test_sticky_cutoff_with_minimal_lines():
         1
         """)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 """
@@ -4016,7 +3724,7 @@ def test_exception_lineno():
             """
             ~~~^^
             """.rstrip()
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else ""
         )
         + f"""
@@ -4064,7 +3772,8 @@ def test_postmortem_noargs():
 
 
 def test_postmortem_needs_exceptioncontext():
-    pytest.raises(ValueError, pdbpp.post_mortem)
+    with pytest.raises(ValueError):
+        pdbpp.post_mortem()
 
 
 def test_exception_through_generator():
@@ -4079,7 +3788,7 @@ def test_exception_through_generator():
         except AssertionError:
             xpm()
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         error_indicator = "\n.*~~~^^"
     elif sys.version_info >= (3, 12, 1):
         error_indicator = "\n.*^^^^^"
@@ -4138,12 +3847,7 @@ def test_source_with_pygments():
         set_trace(Config=ConfigWithPygments)
         return bar()
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mbar^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mbar^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mbar^[[39m():"
 
     expected = textwrap.dedent(
         f"""
@@ -4157,18 +3861,7 @@ def test_source_with_pygments():
         """.rstrip()
     )
 
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygments)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygments") + expected
 
     check(fn, expected)
 
@@ -4193,18 +3886,7 @@ def test_source_with_highlight():
         # c
         """,
     )
-    if sys.version_info > (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithHighLight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config^[[38;5;241m=^[[39mConfigWithHighLight") + expected
 
 
 def test_source_with_pygments_and_highlight():
@@ -4215,12 +3897,7 @@ def test_source_with_pygments_and_highlight():
         set_trace(Config=ConfigWithPygmentsAndHighlight)
         return bar()
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mbar^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mbar^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mbar^[[39m():"
 
     expected = textwrap.dedent(f"""
         [NUM] > .*fn()
@@ -4231,18 +3908,10 @@ def test_source_with_pygments_and_highlight():
         <COLORNUM>             ^[[38;5;28;01mreturn^[[39;00m ^[[38;5;241m42^[[39m
         # c
         """)
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = (
+        py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight")
+        + expected
+    )
 
     check(
         fn,
@@ -4276,7 +3945,7 @@ def test_edit():
         fn()
         return 100
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     return42_lineno = lineno + 2
     call_fn_lineno = lineno + 5
 
@@ -4316,7 +3985,7 @@ def test_edit_obj():
     def bar():
         pass
 
-    _, bar_lineno = inspect.getsourcelines(bar)
+    bar_lineno = bar.__code__.co_firstlineno
 
     expected = rf"""
         [NUM] > .*fn()
@@ -4362,7 +4031,7 @@ def test_put():
         set_trace()
         return 42
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     start_lineno = lineno + 1
 
     expected = rf"""
@@ -4389,7 +4058,7 @@ def test_paste():
             g()
         return 42
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     start_lineno = lineno + 1
 
     expected = rf"""
@@ -4415,7 +4084,7 @@ def test_put_if():
             set_trace()
         return x
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     start_lineno = lineno + 3
 
     expected = rf"""
@@ -4447,7 +4116,7 @@ def test_put_side_effects_free():
         set_trace()
         return 42
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     start_lineno = lineno + 2
 
     expected = rf"""
@@ -4486,7 +4155,7 @@ def test_enable_disable_via_module():
         2
         # c
         """)
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 """
@@ -4514,7 +4183,7 @@ def test_enable_disable_from_prompt_via_class():
         pdb_.set_trace()
         return x
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
             [NUM] > .*fn()
             -> pdb_.set_trace()
@@ -4564,10 +4233,7 @@ def test_hide_hidden_frames():
         g()
         return 1
 
-    if sys.version_info >= (3, 13):
-        trace_line = "set_trace()"
-    else:
-        trace_line = 'return "foo"'
+    trace_line = "set_trace()" if IS_PY313 else 'return "foo"'
     expected = f"""
         [NUM] > .*fn()
         -> g()
@@ -4599,10 +4265,7 @@ def test_hide_current_frame():
         g()
         return 1
 
-    if sys.version_info >= (3, 13):
-        trace_line = "set_trace()"
-    else:
-        trace_line = 'return "foo"'
+    trace_line = "set_trace()" if IS_PY313 else 'return "foo"'
 
     expected = f"""
         [NUM] > .*fn()
@@ -4643,7 +4306,7 @@ def test_hide_frame_for_set_trace_on_class():
         # c
         """)
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 r"""
@@ -4673,10 +4336,7 @@ def test_list_hidden_frames():
         k()
         return 1
 
-    if sys.version_info >= (3, 13):
-        trace_line = "set_trace()"
-    else:
-        trace_line = 'return "foo"'
+    trace_line = "set_trace()" if IS_PY313 else 'return "foo"'
     expected = rf"""
         [NUM] > .*fn()
         -> k()
@@ -4744,7 +4404,7 @@ def test_hidden_pytest_frames():
         """,
     )
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 r"""
@@ -4773,10 +4433,7 @@ def test_hidden_unittest_frames():
     def fn():
         return g()
 
-    if sys.version_info >= (3, 13):
-        trace_line = "set_trace()"
-    else:
-        trace_line = 'return "foo"'
+    trace_line = "set_trace()" if IS_PY313 else 'return "foo"'
 
     expected = rf"""
         [NUM] > .*s()
@@ -4834,10 +4491,7 @@ def test_disable_hidden_frames():
         g()
         return 1
 
-    if sys.version_info >= (3, 13):
-        trace_line = "set_trace(Config=MyConfig)"
-    else:
-        trace_line = 'return "foo"'
+    trace_line = "set_trace(Config=MyConfig)" if IS_PY313 else 'return "foo"'
 
     expected = f"""
         [NUM] > .*g()
@@ -5107,7 +4761,7 @@ def test_syntaxerror_in_command():
         + (
             """
         ... ."""  # multi-line prompt, add a random '.' to trigger SyntaxError
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else ""
         )
         + """
@@ -5164,7 +4818,7 @@ def test_debug_with_overridden_continue():
             """
         -> set_trace(Pdb=CustomPdb)
         """
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else """
         -> assert count_continue == 3
         """
@@ -5209,7 +4863,7 @@ def test_before_interaction_hook():
         # c
         """
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -5251,7 +4905,7 @@ def test_continue_arg():
         z = 3
         return x + y + z
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     line_z = lineno + 4
 
     expected = f"""
@@ -5301,12 +4955,12 @@ def test_continue_arg_with_error():
         z = 3
         return x + y + z
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
     line_z = lineno + 4
 
     error = (
         "NameError: name 'c' is not defined"
-        if sys.version_info >= (3, 13)
+        if IS_PY313
         else "The specified object '.foo' is not a function or was not found along sys.path."
     )
 
@@ -5346,7 +5000,7 @@ def test_set_trace_header():
            5 frames hidden .*
         # n
         """.lstrip()
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else ""
         )
         + """
@@ -5453,7 +5107,7 @@ def test_interaction_restores_previous_sigint_handler():
         pdb 2: <built-in function default_int_handler>
         """
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -5491,15 +5145,7 @@ def test_recursive_set_trace():
         # inner()
         # c
         """
-    if sys.version_info >= (3, 13):
-        expected = textwrap.dedent(
-            """
-            [NUM] > .*inner()
-            -> set_trace()
-               5 frames hidden .*
-            # n
-            """.rstrip(),
-        ) + textwrap.dedent(expected)
+    expected = py313_preamble(funcname="inner") + textwrap.dedent(expected)
 
     check(fn, expected)
 
@@ -5532,7 +5178,7 @@ def test_steps_over_set_trace():
         # c
         2
         """
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else """
         -> print(2)
            5 frames hidden .*
@@ -5551,7 +5197,7 @@ def test_break_after_set_trace():
         print(1)
         print(2)
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
 
     expected = f"""
         [NUM] > .*fn()
@@ -5580,7 +5226,7 @@ def test_break_with_inner_set_trace():
         inner()
         print(1)
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
 
     if sys.version_info < (3, 14):
         expected = (
@@ -5602,7 +5248,7 @@ def test_break_with_inner_set_trace():
         --Return--
         [NUM] .*inner()
         """
-                if sys.version_info >= (3, 13)
+                if IS_PY313
                 else """
         [NUM] > .*inner()->None
         """
@@ -5642,10 +5288,6 @@ def test_break_with_inner_set_trace():
 def test_pdbrc_continue(tmpdirhome):
     """Test that interaction is skipped with continue in pdbrc."""
     assert os.getcwd() == str(tmpdirhome)
-    pdbrc_read_fixed = (  # https://github.com/python/cpython/issues/90095
-        (sys.version_info >= (3, 11, 9) and sys.version_info <= (3, 12, 1))
-        or sys.version_info >= (3, 12, 2)
-    ) and sys.platform != "darwin"
     with open(".pdbrc", "w") as f:
         f.writelines(
             [
@@ -5658,7 +5300,7 @@ def test_pdbrc_continue(tmpdirhome):
         set_trace(readrc=True)
         print("after_set_trace")
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -5676,7 +5318,7 @@ def test_pdbrc_continue(tmpdirhome):
             -> print("after_set_trace")
                5 frames hidden .*
                """.rstrip()
-                if pdbrc_read_fixed
+                if PDBRC_READ_FIXED
                 else ""
             )
             + """
@@ -5696,7 +5338,7 @@ def test_python_m_pdb_usage():
     err = stderr.decode()
     assert not err
 
-    message = "usage: pdb" + ".py" if sys.version_info < (3, 13) else ""
+    message = "usage: pdb" + ".py" if not IS_PY313 else ""
     assert message in out
 
 
@@ -5755,7 +5397,7 @@ def get_completions(text):
         val = complete(text, len(comps))
         if val is None:
             break
-        comps += [val]
+        comps.append(val)
     return comps
 
 
@@ -5788,7 +5430,7 @@ def test_set_trace_in_completion(readline_param, monkeypatch_readline):
             """
         --Return--
         """
-            if sys.version_info < (3, 13)
+            if not IS_PY313
             else """
         """
         )
@@ -5845,7 +5487,7 @@ def test_completes_from_pdb(monkeypatch_readline):
 
         set_trace()
 
-    _, lineno = inspect.getsourcelines(fn)
+    lineno = fn.__code__.co_firstlineno
 
     if sys.version_info >= (3, 10, 0, "a", 7):  # bpo-24160
         pre_py310_output = ""
@@ -5865,7 +5507,7 @@ def test_completes_from_pdb(monkeypatch_readline):
         + (
             """
         --Return--"""
-            if sys.version_info < (3, 13)
+            if not IS_PY313
             else ""
         )
         + f"""
@@ -5881,9 +5523,7 @@ def test_completes_from_pdb(monkeypatch_readline):
     check(fn, expected)
 
 
-@pytest.mark.xfail(
-    sys.version_info >= (3, 13), reason="unsure if this is a bug with 3.13"
-)
+@pytest.mark.xfail(IS_PY313, reason="unsure if this is a bug with 3.13")
 def test_completion_uses_tab_from_fancycompleter(monkeypatch_readline):
     """Test that pdb's original completion is used."""
 
@@ -5974,14 +5614,12 @@ def test_complete_removes_duplicates_with_coloring(
 
         set_trace()
 
-    _, lineno = inspect.getsourcelines(fn)
-
     expected = (
         (
             """
         --Return
         """
-            if sys.version_info < (3, 13)
+            if not IS_PY313
             else """
             """
         )
@@ -6079,8 +5717,6 @@ def test_complete_uses_attributes_only_from_orig_pdb(
 
         set_trace()
 
-    _, lineno = inspect.getsourcelines(fn)
-
     expected = """
         --Return--
         [NUM] > .*fn().*
@@ -6116,14 +5752,12 @@ def test_completion_removes_tab_from_fancycompleter(monkeypatch_readline):
 
         set_trace()
 
-    _, lineno = inspect.getsourcelines(fn)
-
     expected = (
         (
             """
         --Return--
         """
-            if sys.version_info < (3, 13)
+            if not IS_PY313
             else """
         """
         )
@@ -6166,7 +5800,7 @@ def test_complete_with_bang(monkeypatch_readline):
             """
         --Return--
         """
-            if sys.version_info < (3, 13)
+            if not IS_PY313
             else """
         """
         )
@@ -6286,16 +5920,17 @@ def test_nested_completer(testdir):
         child.expect_exact("\r\n(Pdb++) completeme\x07\r\x1b[19G_outer")
     else:
         child.expect_exact("\r\n(Pdb++) completeme_outer")
-    child.send("\nimport pdbpp; _p = pdbpp.Pdb(); _p.reset()")
-    child.send("\n_p.interaction(frames[0], None)\n")
+    child.send(
+        "\nimport pdbpp; _p = pdbpp.Pdb(); _p.reset()"
+        "\n_p.interaction(frames[0], None)\n"
+    )
     child.expect_exact("\r\n-> frames.append(sys._getframe())\r\n(Pdb++) ")
     child.send("completeme\t")
     if has_libedit:
         child.expect_exact("completeme\x07\r\x1b[19G_inner")
     else:
         child.expect_exact("completeme_inner")
-    child.send("\nq\n")
-    child.send("completeme\t")
+    child.send("\nq\ncompleteme\t")
     if has_libedit:
         child.expect_exact("completeme\x07\r\x1b[19G_outer")
     else:
@@ -6313,8 +5948,7 @@ def test_ensure_file_can_write_unicode():
     assert p.stdout.stream is out
 
     p.stdout.write("test äöüß")
-    out.seek(0)
-    assert out.read().decode("utf-8") == "test äöüß"
+    assert out.getvalue() == "test äöüß".encode()
 
 
 def test_signal_in_nonmain_thread_with_interaction():
@@ -6333,25 +5967,16 @@ def test_signal_in_nonmain_thread_with_interaction():
         evt.set()
         t.join()
 
-    expected = (
-        """
+    return_line = "" if IS_PY313 else "\n        --Return--"
+    expected = f"""
         [NUM] > .*fn()
         -> evt.set()
            5 frames hidden .*
-        # c
-        """.rstrip()
-        + (
-            ""
-            if sys.version_info >= (3, 13)
-            else """
-        --Return--"""
-        )
-        + """
+        # c{return_line}
         [NUM] > .*start_thread()
         -> set_trace(nosigint=False)
         # c
         """
-    )
     check(fn, expected, add_313_fix=True, set_trace_args="nosigint=False")
 
 
@@ -6374,7 +5999,7 @@ def test_signal_in_nonmain_thread_with_continue():
         # set_trace(nosigint=False)
         t.join()
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = """
             [NUM] > .*start_thread()
             -> set_trace(nosigint=False)
@@ -6420,7 +6045,7 @@ def test_next_at_end_of_stack_after_unhide():
         before_interaction_hook
         # c
         """
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -6541,10 +6166,9 @@ def test_chained_syntaxerror_with_traceback():
         set_trace()
 
     caret_line = ".*"
-    error_marker = ".*~*^*"
+    error_marker = "\n        .*~*^*" if IS_PY313 else ""
 
-    expected = (
-        """
+    expected = f"""
         --Return--
         [NUM] > .*fn()
         -> set_trace()
@@ -6553,27 +6177,9 @@ def test_chained_syntaxerror_with_traceback():
         \\*\\*\\* AttributeError.*
         Traceback (most recent call last):
           File .*, in error
-            compile_error()
-        """.rstrip()
-        + (
-            f"""
-        {error_marker}
-         """.rstrip()
-            if sys.version_info >= (3, 13)
-            else ""
-        )
-        + """
+            compile_error(){error_marker}
           File .*, in compile_error
-            compile.*
-          """.rstrip()
-        + (
-            f"""
-        {error_marker}
-         """.rstrip()
-            if sys.version_info >= (3, 13)
-            else ""
-        )
-        + f"""
+            compile.*{error_marker}
           File "<stdin>", line 1
             invalid(
         {caret_line}
@@ -6586,7 +6192,6 @@ def test_chained_syntaxerror_with_traceback():
             raise AttributeError
         # c
     """
-    )
 
     check(fn, expected, add_313_fix=True)
 
@@ -6634,8 +6239,8 @@ def test_error_with_traceback_limit():
 
         set_trace(Config=ConfigWithLimit)
 
-    expected = (
-        """
+    error_marker = "\n        .*~^*" if IS_PY313 else ""
+    expected = f"""
         --Return--
         [NUM] > .*fn()
         -> set_trace(Config=ConfigWithLimit)
@@ -6644,30 +6249,11 @@ def test_error_with_traceback_limit():
         \\*\\*\\* ValueError: the_end
         Traceback (most recent call last):
           File .*, in error
-            f(10)
-        """.rstrip()
-        + (
-            """
-        .*~^*
-        """.rstrip()
-            if sys.version_info >= (3, 13)
-            else ""
-        )
-        + """
+            f(10){error_marker}
           File .*, in f
-            f(i)
-        """.rstrip()
-        + (
-            """
-        .*~^*
-        """.rstrip()
-            if sys.version_info >= (3, 13)
-            else ""
-        )
-        + """
+            f(i){error_marker}
         # c
         """
-    )
 
     check(
         fn,
@@ -6696,7 +6282,7 @@ def test_complete_displays_errors(show, monkeypatch, LineMatcher):
 
     lm = LineMatcher(out)
     to_match = []
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         to_match.extend(
             [
                 "* > *(*)fn()",
@@ -6719,7 +6305,7 @@ def test_complete_displays_errors(show, monkeypatch, LineMatcher):
                 "# get_completions('test')",
                 "*** error during completion: err_complete",
                 "ValueError: err_complete",
-                "[]" if sys.version_info >= (3, 13) else "[[][]]",
+                "[]" if IS_PY313 else "[[][]]",
                 "# c",
             ]
         )
@@ -6793,7 +6379,7 @@ def test_locals():
            5 frames hidden .*
         # n
         """
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else """
         """
         ).rstrip()
@@ -6858,20 +6444,15 @@ def test_get_editor_cmd(monkeypatch):
 
     monkeypatch.delenv("EDITOR")
 
-    try:
-        which = "shutil.which"
-        monkeypatch.setattr(which, lambda x: None)
-    except AttributeError:
-        which = "distutils.spawn.find_executable"
-        monkeypatch.setattr(which, lambda x: None)
+    monkeypatch.setattr("shutil.which", lambda x: None)
     with pytest.raises(
         RuntimeError, match=(r"Could not detect editor. Configure it or set \$EDITOR.")
     ):
         _pdb._get_editor_cmd("fname", 42)
 
-    monkeypatch.setattr(which, lambda x: "vim")
+    monkeypatch.setattr("shutil.which", lambda x: "vim")
     assert _pdb._get_editor_cmd("fname", 42) == "vim +42 fname"
-    monkeypatch.setattr(which, lambda x: "vi")
+    monkeypatch.setattr("shutil.which", lambda x: "vi")
     assert _pdb._get_editor_cmd("fname", 42) == "vi +42 fname"
 
     _format = _pdb._format_editcmd
@@ -6930,29 +6511,14 @@ def test_global_pdb_per_thread_with_input_lock():
         t1.join()
         t2.join()
 
-    expected = (
-        (
-            ""
-            if sys.version_info >= (3, 13)
-            else """
-        --Return--
-        """.rstrip()
-        )
-        + """
+    return_line = "" if IS_PY313 else "\n        --Return--"
+    expected = f"""{return_line}
         [NUM] > .*__t1__()
         -> set_trace(cleanup=False)
         # evt1.set()
         # import threading; threading.current_thread().name
         '__t1__'
-        # assert evt2.wait(1.0) is True; import time; time.sleep(0.1)"""
-        + (
-            ""
-            if sys.version_info >= (3, 13)
-            else """
-        --Return--
-        """.rstrip()
-        )
-        + """
+        # assert evt2.wait(1.0) is True; import time; time.sleep(0.1){return_line}
         [NUM] > .*__t2__().*
         -> set_trace(cleanup=False)
         # import threading; threading.current_thread().name
@@ -6962,7 +6528,6 @@ def test_global_pdb_per_thread_with_input_lock():
         '__t1__'
         # c
         """
-    )
 
     check(fn, expected)
 
@@ -6987,7 +6552,7 @@ def test_usage_error_with_commands():
                  (Pdb)
         # c
         """
-        if sys.version_info >= (3, 13)
+        if IS_PY313
         else """
         .*Usage.*: commands [bnum]
                 ...
@@ -7052,8 +6617,8 @@ def test_debug_with_set_trace():
 
         set_trace()
 
-    expected = (
-        """
+    return_line = "" if IS_PY313 else "--Return--\n"
+    expected = f"""
         --Return--
         [NUM] > .*fn()
         .*
@@ -7061,15 +6626,7 @@ def test_debug_with_set_trace():
         # debug inner()
         ENTERING RECURSIVE DEBUGGER
         [NUM] > <string>(1)<module>()->None
-        (#) r
-        """.rstrip()
-        + (
-            ""
-            if sys.version_info >= (3, 13)
-            else """--Return--
-        """
-        )
-        + """
+        (#) r{return_line}
         [NUM] > .*inner().*
         -> set_trace(cleanup=False)
            5 frames hidden .*
@@ -7084,7 +6641,6 @@ def test_debug_with_set_trace():
         LEAVING RECURSIVE DEBUGGER
         # c
         """
-    )
 
     check(fn, expected, add_313_fix=True)
 
@@ -7134,7 +6690,7 @@ def test_config_gets_start_filename():
     -> set_trace(Config=MyConfig)
        NUM frames hidden .*
     # n
-    """ if sys.version_info >= (3, 13) else """
+    """ if IS_PY313 else """
     config_setup
     """).rstrip() + """
     [NUM] > .*fn()
@@ -7148,28 +6704,31 @@ def test_config_gets_start_filename():
     check(fn, expected)
 
 
-def test_do_bt():
-    def fn():
-        set_trace()
+def get_expected_bt(frame):
+    """Get the expected "bt" lines for the frames above runpdb().
+
+    ``frame`` is the frame of the test function that calls check().
+    """
+    # Only filenames and names are needed: skip the source line lookups.
+    stack = traceback.StackSummary.extract(
+        traceback.walk_stack(frame), lookup_lines=False
+    )
+    stack.reverse()
+    # "bt" adds the check() and run_func() frames below the test, but hides
+    # pluggy's 5 _multicall frames above it: 3 entries fewer than the stack.
+    del stack[-3:]
+
+    has_frozen_runpy = sys.platform == "win32" and sys.version_info >= (3, 11)
 
     expected_bt = []
     _entry: traceback.FrameSummary
-    for i, _entry in enumerate(traceback.extract_stack()[:-3]):
+    for i, _entry in enumerate(stack):
         expected_bt.append(f"  [{i:2d}] .*")
 
         if (
-            sys.platform == "win32"
-            and sys.version_info >= (3, 11)
-            and (
-                _entry.filename == "<frozen runpy>"
-                and any(
-                    _entry.name == name
-                    for name in (
-                        "_run_module_as_main",
-                        "_run_code",
-                    )
-                )
-            )
+            has_frozen_runpy
+            and _entry.filename == "<frozen runpy>"
+            and _entry.name in ("_run_module_as_main", "_run_code")
         ):
             # In this case, the first two frames of the traceback look like this:
             #   [ 0] <frozen runpy>(198)_run_module_as_main()
@@ -7178,6 +6737,14 @@ def test_do_bt():
             continue
 
         expected_bt.append("  .*")
+    return expected_bt
+
+
+def test_do_bt():
+    def fn():
+        set_trace()
+
+    expected_bt = get_expected_bt(sys._getframe())
 
     expected = """
 --Return--
@@ -7200,32 +6767,7 @@ def test_do_bt_highlight():
     def fn():
         set_trace(Config=ConfigWithHighlight)
 
-    expected_bt = []
-    _entry: traceback.FrameSummary
-    for i, _entry in enumerate(traceback.extract_stack()[:-3]):
-        expected_bt.append(f"  [{i:2d}] .*")
-
-        if (
-            sys.platform == "win32"
-            and sys.version_info >= (3, 11)
-            and (
-                _entry.filename == "<frozen runpy>"
-                and any(
-                    _entry.name == name
-                    for name in (
-                        "_run_module_as_main",
-                        "_run_code",
-                    )
-                )
-            )
-        ):
-            # In this case, the first two frames of the traceback look like this:
-            #   [ 0] <frozen runpy>(198)_run_module_as_main()
-            #   [ 1] <frozen runpy>(88)_run_code()
-            # meaning we will not need the .* regex to match code for these frames
-            continue
-
-        expected_bt.append("  .*")
+    expected_bt = get_expected_bt(sys._getframe())
 
     expected = r"""
 --Return--
@@ -7241,51 +6783,19 @@ def test_do_bt_highlight():
 # c
 """.format(expected="\n".join(expected_bt))
 
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-            [NUM] > .*fn().*
-            -> set_trace(Config=ConfigWithHighlight)
-               NUM frames hidden .*
-            # n
-        """.rstrip()
-            )
-            + expected
-        )
-    check(fn, expected)
+    check(
+        fn,
+        expected,
+        add_313_fix=True,
+        set_trace_args="Config=ConfigWithHighlight",
+    )
 
 
 def test_do_bt_pygments():
     def fn():
         set_trace(Config=ConfigWithPygments)
 
-    expected_bt = []
-    _entry: traceback.FrameSummary
-    for i, _entry in enumerate(traceback.extract_stack()[:-3]):
-        expected_bt.append(f"  [{i:2d}] .*")
-
-        if (
-            sys.platform == "win32"
-            and sys.version_info >= (3, 11)
-            and (
-                _entry.filename == "<frozen runpy>"
-                and any(
-                    _entry.name == name
-                    for name in (
-                        "_run_module_as_main",
-                        "_run_code",
-                    )
-                )
-            )
-        ):
-            # In this case, the first two frames of the traceback look like this:
-            #   [ 0] <frozen runpy>(198)_run_module_as_main()
-            #   [ 1] <frozen runpy>(88)_run_code()
-            # meaning we will not need the .* regex to match code for these frames
-            continue
-
-        expected_bt.append("  .*")
+    expected_bt = get_expected_bt(sys._getframe())
 
     expected = r"""
 --Return--
@@ -7301,7 +6811,7 @@ def test_do_bt_pygments():
 # c
 """.format(expected="\n".join(expected_bt))
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = (
             textwrap.dedent(
                 """
@@ -7370,7 +6880,7 @@ def test_debug_with_pygments():
         # c
         """
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -7400,7 +6910,7 @@ def test_debug_with_pygments_and_highlight():
         # c
         """
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         expected = textwrap.dedent(
             """
             [NUM] > .*fn()
@@ -7518,18 +7028,7 @@ def test_do_source():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace()
-                   5 frames hidden .*
-                # n
-                """.rstrip()
-            )
-            + expected
-        )
+    expected = py313_preamble() + expected
 
     check(fn, expected)
 
@@ -7538,10 +7037,7 @@ def test_do_source_with_pygments():
     def fn():
         set_trace(Config=ConfigWithPygments)
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = "^[[38;5;28;01mclass^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mclass^[[39;00m ^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
+    highlighted_code = f"^[[38;5;28;01mclass^[[39;00m{PYGMENTS_WS}^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
 
     expected = textwrap.dedent(
         rf"""
@@ -7555,18 +7051,7 @@ def test_do_source_with_pygments():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygments)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygments") + expected
 
     check(fn, expected)
 
@@ -7587,18 +7072,7 @@ def test_do_source_with_highlight():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=ConfigWithHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=ConfigWithHighlight") + expected
 
     check(fn, expected)
 
@@ -7607,10 +7081,7 @@ def test_do_source_with_pygments_and_highlight():
     def fn():
         set_trace(Config=ConfigWithPygmentsAndHighlight)
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = "^[[38;5;28;01mclass^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mclass^[[39;00m ^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
+    highlighted_code = f"^[[38;5;28;01mclass^[[39;00m{PYGMENTS_WS}^[[38;5;21;01mConfigWithPygmentsAndHighlight^[[39;00m(ConfigWithPygments, ConfigWithHigh"
 
     expected = textwrap.dedent(
         rf"""
@@ -7624,18 +7095,10 @@ def test_do_source_with_pygments_and_highlight():
         # c
     """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = (
+        py313_preamble("Config^[[38;5;241m=^[[39mConfigWithPygmentsAndHighlight")
+        + expected
+    )
 
     check(fn, expected)
 
@@ -7659,18 +7122,7 @@ def test_do_source_without_truncating():
         # c
         """,
     )
-    if sys.version_info >= (3, 13):
-        expected = (
-            textwrap.dedent(
-                """
-                [NUM] > .*fn()
-                -> set_trace(Config=Config)
-                   5 frames hidden .*
-                # n
-                """.rstrip(),
-            )
-            + expected
-        )
+    expected = py313_preamble("Config=Config") + expected
 
     check(fn, expected)
 
@@ -7688,34 +7140,24 @@ def test_handles_set_trace_in_config(tmpdir):
 
         set_trace(Config=Config)
 
-    expected = (
-        r"""
+    if IS_PY313:
+        init_line = "-> set_trace(Config=Config)"
+        return_line = ""
+    else:
+        init_line = '-> print("after_set_trace")'
+        return_line = "\n        --Return--"
+    expected = rf"""
         Config.__init__
         pdb\+\+: using pdb.Pdb for recursive set_trace.
         > .*__init__()
-        """
-        + (
-            "-> set_trace(Config=Config)"
-            if sys.version_info >= (3, 13)
-            else '-> print("after_set_trace")'
-        )
-        + """
+        {init_line}
         (Pdb) c
-        after_set_trace
-        """.rstrip()
-        + (
-            ""
-            if sys.version_info >= (3, 13)
-            else """
-        --Return--"""
-        )
-        + """
+        after_set_trace{return_line}
         [NUM] > .*fn().*
         -> set_trace(Config=Config)
            5 frames hidden .*
         # c
         """
-    )
 
     check(fn, expected)
 
@@ -7768,14 +7210,9 @@ def test_keeps_reset_escape_sequence_with_source_highlight():
         b = "bbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbX"
         return a, b
 
-    if int(pygments_major) >= 2 and int(pygments_minor) >= 19:
-        highlighted_code = (
-            "^[[38;5;28;01mdef^[[39;00m^[[38;5;250m ^[[39m^[[38;5;21mfn^[[39m():"
-        )
-    else:  # pygments 2.18
-        highlighted_code = "^[[38;5;28;01mdef^[[39;00m ^[[38;5;21mfn^[[39m():"
+    highlighted_code = f"^[[38;5;28;01mdef^[[39;00m{PYGMENTS_WS}^[[38;5;21mfn^[[39m():"
 
-    if sys.version_info >= (3, 13):
+    if IS_PY313:
         curline_313 = "COLORCURLINE"
         curline_pre_313 = "COLORNUM"
         marker_313 = "->"
@@ -7839,7 +7276,7 @@ def test_stdout_reconfigured(pass_stdout, monkeypatch):
         """
         + (
             "-> set_trace(Pdb=_PdbTestKeepRawInput, cleanup=False)"
-            if sys.version_info >= (3, 13)
+            if IS_PY313
             else "-> assert pdbpp.local.GLOBAL_PDB.stdout is sys.stdout"
         )
         + """
@@ -7899,26 +7336,31 @@ def test_set_trace_in_skipped_module(testdir):
         set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 2
         set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 3
 
-    # fmt: off
-    expected = r"""
+    if IS_PY313:
+        first_line = "-> set_trace(Pdb=SkippingPdbTest)  # 1"
+        second_line = "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # "
+        return_line = ""
+        third_line = ""
+    else:
+        first_line = "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 2"
+        second_line = "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 3"
+        return_line = "\n        --Return--"
+        third_line = "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 3"
+    expected = rf"""
         [NUM] > .*fn()
-        """ + ("-> set_trace(Pdb=SkippingPdbTest)  # 1" if sys.version_info >= (3, 13) else "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 2") + r"""
+        {first_line}
            5 frames hidden (try 'help hidden_frames')
         # n
         is_skipped_module\? testing.test_pdb
         [NUM] > .*fn()
-        """ + ("-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # " if sys.version_info >= (3, 13) else "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 3") + """
+        {second_line}
            5 frames hidden (try 'help hidden_frames')
-        # c
-        """.rstrip() + ("" if sys.version_info >= (3, 13) else """
-        --Return--
-        """.rstrip()) + """
+        # c{return_line}
         [NUM] > .*fn()
-        """ + ("" if sys.version_info >= (3, 13) else "-> set_trace(Pdb=SkippingPdbTest, cleanup=False)  # 3") + """
+        {third_line}
            5 frames hidden (try 'help hidden_frames')
         # c
         """
-    # fmt: on
 
     check(fn, expected)
 
@@ -7945,11 +7387,7 @@ def test_exception_info_main(testdir):
     result.stdout.lines = [
         ln.replace(pdbpp.CLEARSCREEN, "<CLEARSCREEN>") for ln in result.stdout.lines
     ]
-    assert (
-        result.stdout.str().count("<CLEARSCREEN>") == 2
-        if sys.version_info < (3, 13)
-        else 1
-    )
+    assert result.stdout.str().count("<CLEARSCREEN>") == 2 if not IS_PY313 else 1
     lines_to_match = [
         "(Pdb++) 'sticky'",
         "(Pdb++) <CLEARSCREEN>[[]2[]] > */test_exception_info_main.py(1)<module>()",
@@ -7962,7 +7400,7 @@ def test_exception_info_main(testdir):
         "ValueError: foo",
         "(Pdb++) 'quit'",
     ]
-    if sys.version_info < (3, 13):
+    if not IS_PY313:
         lines_to_match.extend(
             [
                 "(Pdb++) Post mortem debugger finished. *",